@@ -765,6 +765,21 @@ case "$SERVER_TEST_TO_RUN" in
     kill_hge_servers
     ;;
 
+  concurrent-flood)
+    echo -e "\n$(time_elapsed): <########## TEST EVENT FLOOD WITH CONCURRENT INSERTS #####################################>\n"
+    TEST_TYPE="concurrent-flood"
+    export HASURA_GRAPHQL_ADMIN_SECRET="HGE$RANDOM$RANDOM"
+    # test_events.py checks backpressure against this pool size
+    export HASURA_GRAPHQL_EVENTS_HTTP_POOL_SIZE=8
+
+    run_hge_with_args serve
+    wait_for_port 8080
+
+    pytest -n 1 --hge-urls "$HGE_URL" --pg-urls "$HASURA_GRAPHQL_DATABASE_URL" --hge-key="$HASURA_GRAPHQL_ADMIN_SECRET" --test-concurrent-flood test_events.py::TestEventFloodConcurrentInserts
+
+    kill_hge_servers
+    ;;
+
   query-logs)
     # verbose logging tests
     echo -e "\n$(time_elapsed): <########## TEST GRAPHQL-ENGINE WITH QUERY LOG ########>\n"
@@ -193,6 +193,13 @@ This option may result in test failures if the schema has to change between the
         default=False
     )
 
+    parser.addoption(
+        "--test-concurrent-flood",
+        action="store_true",
+        default=False,
+        help="Also run the event trigger flood test with the backlog generated by concurrent single-row inserts"
+    )
+
 
 
 #By default,
@@ -305,6 +312,9 @@ def hge_ctx(request):
     # TODO why do we sleep here?
     time.sleep(1)
 
+# NOTE: the port is fixed since the triggers set up in queries/event_triggers
+# point their webhooks at it. This doesn't serialize xdist workers, as with
+# --dist=loadfile all of test_events.py runs on a single worker anyway.
 @pytest.fixture(scope='class')
 def evts_webhook(request):
     webhook_httpd = EvtsWebhookServer(server_address=('127.0.0.1', 5592))
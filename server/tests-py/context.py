@@ -6,6 +6,7 @@ from urllib.parse import urlparse
 from ruamel.yaml.comments import CommentedMap as OrderedDict # to avoid '!!omap' in yaml
 import threading
 import http.server
+import collections
 import json
 import queue
 import socket
@@ -24,6 +25,12 @@ from sqlalchemy.schema import MetaData
 import graphql_server
 import graphql
 
+# orjson is optional; when installed we use it to serialize request bodies
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # pytest has removed the global pytest.config
 # As a solution to this we are going to store it in PyTestConf.config
 class PytestConf():
@@ -32,6 +39,17 @@ class PytestConf():
 class HGECtxError(Exception):
     pass
 
+# Serialize a request body to JSON bytes, with orjson if it's available. We
+# fall back to json for values orjson doesn't support (e.g. the float
+# subclasses ruamel loads from yaml files).
+def json_dumps(q):
+    if orjson is not None:
+        try:
+            return orjson.dumps(q)
+        except TypeError:
+            pass
+    return json.dumps(q).encode('utf-8')
+
 # NOTE: use this to generate a GraphQL client that uses the `Apollo`(subscription-transport-ws) sub-protocol
 class GQLWsClient():
 
@@ -517,6 +535,11 @@ class EvtsWebhookHandler(http.server.BaseHTTPRequestHandler):
             time.sleep(2)
             self.send_response(HTTPStatus.NO_CONTENT)
             self.end_headers()
+        # ...and this one for half a second:
+        elif req_path == "/sleep_500ms":
+            time.sleep(0.5)
+            self.send_response(HTTPStatus.NO_CONTENT)
+            self.end_headers()
         # This is like a sleep endpoint above, but allowing us to decide
         # externally when the webhook can return, with unblock()
         elif req_path == "/block":
@@ -533,9 +556,9 @@ class EvtsWebhookHandler(http.server.BaseHTTPRequestHandler):
             self.send_response(HTTPStatus.NO_CONTENT)
             self.end_headers()
 
-        self.server.resp_queue.put({"path": req_path,
-                                    "body": req_json,
-                                    "headers": req_headers})
+        self.server.put_event({"path": req_path,
+                               "body": req_json,
+                               "headers": req_headers})
 
 # A very slightly more sane/performant http server.
 # See: https://stackoverflow.com/a/14089457/176841
@@ -546,8 +569,15 @@ class ThreadedHTTPServer(ThreadingMixIn, http.server.HTTPServer):
 
 class EvtsWebhookServer(ThreadedHTTPServer):
     def __init__(self, server_address):
-        # Data received from hasura by our web hook, pushed after it returns to the client:
-        self.resp_queue = queue.Queue()
+        # Data received from hasura by our web hook, pushed after it returns to the client.
+        # NOTE: this is a deque guarded by a condition rather than a queue.Queue,
+        # so that get_events can drain a whole batch under one lock:
+        self.events = collections.deque()
+        self.events_available = threading.Condition()
+        # Ids of the most recently returned events, so that get_events can skip
+        # redeliveries of them; bounded so this doesn't grow forever:
+        self.returned_ids = collections.OrderedDict()
+        self.max_returned_ids = 1024
         # We use these two vars to coordinate unblocking in the /block route
         self.unblocked = False
         self.unblocked_wait = threading.Condition()
@@ -569,11 +599,43 @@ class EvtsWebhookServer(ThreadedHTTPServer):
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.socket.bind(self.server_address)
 
+    def put_event(self, event):
+        with self.events_available:
+            self.events.append(event)
+            self.events_available.notify()
+
     def get_event(self, timeout):
-        return self.resp_queue.get(timeout=timeout)
+        return self.get_events(1, timeout)[0]
+
+    # Get 'n' events, waiting at most 'timeout' seconds in total. Raises
+    # queue.Empty if they don't all arrive in time.
+    #
+    # Delivery is at-least-once, so with 'unique' we skip events whose id we've
+    # already returned, rather than letting a retry stand in for a missing
+    # event. Don't use this when checking the retries themselves.
+    def get_events(self, n, timeout, unique=False):
+        deadline = time.monotonic() + timeout
+        events = []
+        with self.events_available:
+            while len(events) < n:
+                if not self.events_available.wait_for(lambda: self.events, deadline - time.monotonic()):
+                    raise queue.Empty
+                while self.events and len(events) < n:
+                    event = self.events.popleft()
+                    event_id = event['body'].get('id')
+                    if event_id is not None:
+                        if unique and event_id in self.returned_ids:
+                            continue
+                        self.returned_ids[event_id] = None
+                        self.returned_ids.move_to_end(event_id)
+                        if len(self.returned_ids) > self.max_returned_ids:
+                            self.returned_ids.popitem(last=False)
+                    events.append(event)
+        return events
 
     def is_queue_empty(self):
-        return self.resp_queue.empty
+        with self.events_available:
+            return not self.events
 
     def teardown(self):
         self.evt_trggr_httpd.shutdown()
@@ -611,7 +673,12 @@ class HGECtx:
 
     def __init__(self, hge_url, pg_url, config):
 
+        # All requests to HGE share this session, so connections are kept
+        # alive between them. The pool is sized for tests that also issue
+        # requests from a few threads concurrently.
         self.http = requests.Session()
+        self.http.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32))
+        self.http.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32))
         self.hge_key = config.getoption('--hge-key')
         self.hge_url = hge_url
         self.pg_url = pg_url
@@ -721,13 +788,15 @@ class HGECtx:
         conn.close()
         return res
 
+    # 'q' may also be a query already serialized to JSON bytes
     def execute_query(self, q, url_path, headers = {}):
         h = headers.copy()
+        h['Content-Type'] = 'application/json'
         if self.hge_key is not None:
             h['X-Hasura-Admin-Secret'] = self.hge_key
         resp = self.http.post(
             self.hge_url + url_path,
-            json=q,
+            data=q if isinstance(q, bytes) else json_dumps(q),
             headers=h
         )
         # NOTE: make sure we preserve key ordering so we can test the ordering
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 
+import collections
+import concurrent.futures
+import math
+import os
 import pytest
 import queue
+from abc import ABC, abstractmethod
 import time
 import utils
-from validate import check_query_f, check_event
+from context import json_dumps, PytestConf
+from validate import check_query_f, check_event, check_events_seq
 
 usefixtures = pytest.mark.usefixtures
 
@@ -13,6 +19,19 @@ usefixtures = pytest.mark.usefixtures
 # A few tests are going to be excluded with skip_server_upgrade_test mark
 pytestmark = [usefixtures('evts_webhook'), pytest.mark.allow_server_upgrade_test]
 
+# How long to wait for a large batch of events to all be delivered. Locally the
+# webhook keeps up well (ThreadedHTTPServer helps), but it can't in CI, so we're
+# more lenient whenever the CI env var is set (as CircleCI and most other CI
+# providers do). Can be overridden with HGE_TEST_EVENT_TIMEOUT
+EVENTS_TIMEOUT = int(os.environ.get('HGE_TEST_EVENT_TIMEOUT', 120 if os.environ.get('CI') else 30))
+
+# Tables and rows used throughout; these must not be mutated by tests
+TEST_T1 = {"schema": "hge_tests", "name": "test_t1"}
+TEST_T2 = {"schema": "hge_tests", "name": "test_t2"}
+TEST_T3 = {"schema": "hge_tests", "name": "test_t3"}
+TEST_FLOOD = {"schema": "hge_tests", "name": "test_flood"}
+INIT_ROW = {"c1": 1, "c2": "hello"}
+
 def select_last_event_fromdb(hge_ctx):
     q = {
         "type": "select",
@@ -30,43 +49,99 @@ def select_last_event_fromdb(hge_ctx):
 def insert(hge_ctx, table, row, returning=[], headers = {}):
     return insert_many(hge_ctx, table, [row], returning, headers)
 
+# Fixed JSON fragments of the queries below, which their serialized arguments
+# are spliced between. HGECtx.execute_query sends a bytes query as it is.
+INSERT_Q = (b'{"type":"insert","args":{"table":', b',"objects":', b',"returning":', b'}}')
+UPDATE_Q = (b'{"type":"update","args":{"table":', b',"where":', b',"$set":', b'}}')
+DELETE_Q = (b'{"type":"delete","args":{"table":', b',"where":', b'}}')
+
+def splice_query(fragments, *args):
+    parts = [fragments[0]]
+    for arg, fragment in zip(args, fragments[1:]):
+        parts.append(json_dumps(arg))
+        parts.append(fragment)
+    return b''.join(parts)
+
 def insert_many(hge_ctx, table, rows, returning=[], headers = {}):
-    q = {
-        "type": "insert",
-        "args": {
-            "table": table,
-            "objects": rows,
-            "returning": returning
-        }
-    }
+    q = splice_query(INSERT_Q, table, rows, returning)
     st_code, resp = hge_ctx.v1q(q, headers = headers)
     return st_code, resp
 
 
 def update(hge_ctx, table, where_exp, set_exp, headers = {}):
-    q = {
-        "type": "update",
-        "args": {
-            "table": table,
-            "where": where_exp,
-            "$set": set_exp
-        }
-    }
+    q = splice_query(UPDATE_Q, table, where_exp, set_exp)
     st_code, resp = hge_ctx.v1q(q, headers = headers)
     return st_code, resp
 
 
 def delete(hge_ctx, table, where_exp, headers = {}):
-    q = {
-        "type": "delete",
-        "args": {
-            "table": table,
-            "where": where_exp
-        }
-    }
+    q = splice_query(DELETE_Q, table, where_exp)
     st_code, resp = hge_ctx.v1q(q, headers = headers)
     return st_code, resp
 
+# Insert each row with its own request, 'max_workers' requests at a time. Like
+# insert_many, returns the status code and response, of the first failed
+# insert if there is one
+def insert_concurrently(hge_ctx, table, rows, max_workers=32):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(lambda row: insert(hge_ctx, table, row), rows))
+    for st_code, resp in results:
+        if st_code != 200:
+            return st_code, resp
+    return 200, [resp for _, resp in results]
+
+# The event data we expect for a row changing from 'old' to 'new'
+def ev_data(old=None, new=None):
+    return {"old": old, "new": new}
+
+mutations = {"INSERT": insert, "UPDATE": update, "DELETE": delete}
+
+# A step of run_crud_events: the mutation 'operation' (done with 'args' passed
+# on to insert/update/delete, and request 'headers'), and the event data we
+# then expect. 'check_kwargs' are passed on to check_event for just this step.
+CrudStep = collections.namedtuple(
+    'CrudStep',
+    ['operation', 'args', 'exp_ev_data', 'headers', 'check_kwargs'],
+    defaults=({}, {})
+)
+
+# Run a sequence of CrudSteps on a table, checking the event each of them
+# generates. 'kwargs' are passed on to check_event for every step.
+def run_crud_events(hge_ctx, evts_webhook, table, trig_name, steps, **kwargs):
+    for step in steps:
+        st_code, resp = mutations[step.operation](hge_ctx, table, *step.args, headers = step.headers)
+        assert st_code == 200, resp
+        check_event(hge_ctx, evts_webhook, trig_name, table, step.operation, step.exp_ev_data,
+                    **kwargs, **step.check_kwargs)
+
+# Insert, update and delete a row of 'hge_tests.test_t1', with the event data
+# we expect for each
+BASIC_CRUD_STEPS = [
+    CrudStep("INSERT", (INIT_ROW,),
+             ev_data(new=INIT_ROW)),
+    CrudStep("UPDATE", ({"c1": 1}, {"c2": "world"}),
+             ev_data(old=INIT_ROW, new={**INIT_ROW, "c2": "world"})),
+    CrudStep("DELETE", ({"c1": 1},),
+             ev_data(old={**INIT_ROW, "c2": "world"})),
+]
+
+# The basic insert/update/delete flow on 'hge_tests.test_t1', shared by test
+# classes which only differ in how their "t1_all" trigger is set up. NOTE: the
+# db state fixtures find setup files through dir(), so these can't be
+# collapsed into a single parametrized class.
+class BasicCrudEvents(ABC):
+
+    webhook_path = '/'
+
+    def test_basic(self, hge_ctx, evts_webhook):
+        table = TEST_T1
+        run_crud_events(hge_ctx, evts_webhook, table, "t1_all", BASIC_CRUD_STEPS, webhook_path = self.webhook_path)
+
+    @classmethod
+    @abstractmethod
+    def dir(cls):
+        pass
+
 @usefixtures("per_method_tests_db_state")
 class TestCreateAndDelete:
 
@@ -85,6 +160,10 @@ class TestCreateAndDelete:
     def dir(cls):
         return 'queries/event_triggers/create-delete'
 
+# The 'c1' column of the new row, from an event received by evts_webhook
+def new_c1(ev_full):
+    return ev_full['body']['event']['data']['new']['c1']
+
 # Generates a backlog of events, then:
 # - checks that we're processing with the concurrency and backpressure
 #   characteristics we expect 
@@ -93,24 +172,29 @@ class TestCreateAndDelete:
 # NOTE: this expects:
 #   HASURA_GRAPHQL_EVENTS_HTTP_POOL_SIZE=8
 #   HASURA_GRAPHQL_EVENTS_FETCH_BATCH_SIZE=100  (the default)
-@usefixtures("per_method_tests_db_state")
+@usefixtures("per_class_tests_db_state")
 class TestEventFlood(object):
 
+    # How the backlog of rows gets inserted
+    insert_rows = staticmethod(insert_many)
+
     @classmethod
     def dir(cls):
         return 'queries/event_triggers/flood'
 
     def test_flood(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_flood"}
+        table = TEST_FLOOD
 
         # Trigger a bunch of events; hasura will begin processing but block on /block
         payload = range(1,1001)
-        rows = list(map(lambda x: {"c1": x, "c2": "hello"}, payload))
-        st_code, resp = insert_many(hge_ctx, table, rows)
+        rows = [{"c1": x, "c2": "hello"} for x in payload]
+        st_code, resp = self.insert_rows(hge_ctx, table, rows)
         assert st_code == 200, resp
 
         def check_backpressure():
-            # Expect that HASURA_GRAPHQL_EVENTS_HTTP_POOL_SIZE webhooks are pending:
+            # Expect that HASURA_GRAPHQL_EVENTS_HTTP_POOL_SIZE webhooks are pending.
+            # NOTE: this is checked first since it's cheap, so that we only
+            # query the event log once the webhook is saturated:
             assert evts_webhook.blocked_count == 8
             # ...Great, so presumably: 
             # - event handlers are run concurrently
@@ -138,24 +222,32 @@ class TestEventFlood(object):
             # assert resp['result'][1] == ['200', '1000']
 
         # Rather than sleep arbitrarily, loop until assertions pass:
-        utils.until_asserts_pass(30, check_backpressure)
-        # ...then make sure we're truly stable:
-        time.sleep(3)
-        check_backpressure()
+        utils.until_asserts_pass(30, check_backpressure, interval=1)
+        # ...then make sure we're truly stable, checking once per event fetch:
+        utils.assert_stable(3, 1, check_backpressure)
 
         # unblock open and future requests to /block; check all events processed
         evts_webhook.unblock()
 
-        def get_evt():
-            # TODO ThreadedHTTPServer helps locally (I only need a timeout of
-            # 10 here), but we still need a bit of a long timeout here for CI
-            # it seems, since webhook can't keep up there:
-            ev_full = evts_webhook.get_event(600)
-            return ev_full['body']['event']['data']['new']['c1']
+        evs_full = evts_webhook.get_events(len(payload), EVENTS_TIMEOUT)
         # Make sure we got all payloads (probably out of order):
-        ns = list(map(lambda _: get_evt(), payload))
-        ns.sort()
-        assert ns == list(payload)
+        ns = list(map(new_c1, evs_full))
+        missing = set(payload) - set(ns)
+        assert not missing, "missing={}".format(sorted(missing))
+
+# As above, but with the backlog generated by many small concurrent inserts,
+# which is closer to what a real flood of traffic looks like. This needs its
+# own class, since the evts_webhook fixture can't be blocked again once
+# unblocked. It doubles the cost of the slowest test here, so only runs with
+# --test-concurrent-flood (see the concurrent-flood job in
+# .circleci/test-server.sh).
+@pytest.mark.skipif(
+    not PytestConf.config.getoption('--test-concurrent-flood'),
+    reason="flood test with concurrent inserts runs only with --test-concurrent-flood"
+)
+class TestEventFloodConcurrentInserts(TestEventFlood):
+
+    insert_rows = staticmethod(insert_concurrently)
 
 @usefixtures("per_class_tests_db_state")
 class TestEventDataFormat(object):
@@ -168,10 +260,7 @@ class TestEventDataFormat(object):
       table = {"schema": "hge_tests", "name": "test_bigint"}
 
       init_row = {"id": 50755254975729665, "name": "hello"}
-      exp_ev_data = {
-          "old": None,
-          "new": {"id": "50755254975729665", "name": "hello"}
-      }
+      exp_ev_data = ev_data(new={"id": "50755254975729665", "name": "hello"})
       st_code, resp = insert(hge_ctx, table, init_row)
       assert st_code == 200, resp
       check_event(hge_ctx, evts_webhook, "bigint_all", table, "INSERT", exp_ev_data)
@@ -179,39 +268,23 @@ class TestEventDataFormat(object):
     def test_geojson(self, hge_ctx, evts_webhook):
       table = {"schema": "hge_tests", "name": "test_geojson"}
 
-      exp_ev_data = {
-          "old": {  "id" : 1,
-                    "location":{
-                        "coordinates":[
-                          -43.77,
-                          45.64
-                        ],
-                        "crs":{
-                          "type":"name",
-                          "properties":{
-                              "name":"urn:ogc:def:crs:EPSG::4326"
-                          }
-                        },
-                        "type":"Point"
-                    }
-                  },
-          "new": {  "id": 2,
-                    "location":{
-                        "coordinates":[
-                          -43.77,
-                          45.64
-                        ],
-                        "crs":{
-                          "type":"name",
-                          "properties":{
-                              "name":"urn:ogc:def:crs:EPSG::4326"
-                          }
-                        },
-                        "type":"Point"
-                    }
-                  }
+      location = {
+          "coordinates":[
+            -43.77,
+            45.64
+          ],
+          "crs":{
+            "type":"name",
+            "properties":{
+                "name":"urn:ogc:def:crs:EPSG::4326"
+            }
+          },
+          "type":"Point"
       }
-      
+      exp_ev_data = ev_data(
+          old={"id": 1, "location": location},
+          new={"id": 2, "location": location}
+      )
 
       where_exp = {"id" : 1}
       set_exp = {"id": 2}
@@ -222,42 +295,12 @@ class TestEventDataFormat(object):
 
 
 @usefixtures("per_class_tests_db_state")
-class TestCreateEvtQuery(object):
+class TestCreateEvtQuery(BasicCrudEvents):
 
     @classmethod
     def dir(cls):
         return 'queries/event_triggers/basic'
 
-    def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
-
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data)
-
-        where_exp = {"c1": 1}
-        set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
-        st_code, resp = update(hge_ctx, table, where_exp, set_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "UPDATE", exp_ev_data)
-
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
-        st_code, resp = delete(hge_ctx, table, where_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "DELETE", exp_ev_data)
-
     def test_partitioned_table_basic_insert(self, hge_ctx, evts_webhook):
         if hge_ctx.pg_version < 110000:
             pytest.skip('Event triggers on partioned tables are not supported in Postgres versions < 11')
@@ -268,17 +311,14 @@ class TestCreateEvtQuery(object):
 
         init_row = { "city_id": 1, "logdate": "2006-02-02", "peaktemp": 1, "unitsales": 1}
 
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
+        exp_ev_data = ev_data(new=init_row)
         st_code, resp = insert(hge_ctx, table, init_row)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "measurement_all", table, "INSERT", exp_ev_data)
         st_code, resp = hge_ctx.v1q_f(self.dir() + '/partition_table_teardown.yaml')
         assert st_code == 200, resp
 
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestRetryConf(object):
 
     @classmethod
@@ -290,20 +330,12 @@ class TestRetryConf(object):
     #   num_retries: 4
     #   interval_sec: 1
     def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retry = 0)
-        check_event(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retry = 1)
-        check_event(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retry = 2)
-        check_event(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retry = 3)
-        check_event(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retry = 4)
+        check_events_seq(hge_ctx, evts_webhook, "t1_retry", table, "INSERT", exp_ev_data, webhook_path = "/fail", retries = range(5))
 
     # webhook: http://127.0.0.1:5592/sleep_2s
     # retry_conf:
@@ -311,18 +343,12 @@ class TestRetryConf(object):
     #   interval_sec: 1
     #   timeout_sec: 1
     def test_timeout_short(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t2"}
+        table = TEST_T2
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t2_timeout_short", table, "INSERT", exp_ev_data, webhook_path = "/sleep_2s", retry = 0, get_timeout = 5)
-        check_event(hge_ctx, evts_webhook, "t2_timeout_short", table, "INSERT", exp_ev_data, webhook_path = "/sleep_2s", retry = 1, get_timeout = 5)
-        check_event(hge_ctx, evts_webhook, "t2_timeout_short", table, "INSERT", exp_ev_data, webhook_path = "/sleep_2s", retry = 2, get_timeout = 5)
+        check_events_seq(hge_ctx, evts_webhook, "t2_timeout_short", table, "INSERT", exp_ev_data, webhook_path = "/sleep_2s", retries = range(3), get_timeout = 5)
 
     # webhook: http://127.0.0.1:5592/sleep_2s
     # retry_conf:
@@ -330,19 +356,16 @@ class TestRetryConf(object):
     #   interval_sec: 2
     #   timeout_sec: 10
     def test_timeout_long(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t3"}
+        table = TEST_T3
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         time.sleep(2)
         check_event(hge_ctx, evts_webhook, "t3_timeout_long", table, "INSERT", exp_ev_data, webhook_path = "/sleep_2s")
 
-    # Keep this one last
+    # Keep this one last: the triggers above are still set up, so this checks
+    # that none of them delivered more events than expected
     def test_queue_empty(self, hge_ctx, evts_webhook):
         try:
             evts_webhook.get_event(3)
@@ -350,7 +373,7 @@ class TestRetryConf(object):
         except queue.Empty:
             pass
 
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestEvtHeaders(object):
 
     @classmethod
@@ -358,15 +381,11 @@ class TestEvtHeaders(object):
         return 'queries/event_triggers/headers'
 
     def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
+        exp_ev_data = ev_data(new=INIT_ROW)
         headers = {"X-Header-From-Value": "MyValue", "X-Header-From-Env": "MyEnvValue"}
-        st_code, resp = insert(hge_ctx, table, init_row)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data, headers = headers)
 
@@ -395,7 +414,7 @@ class TestUpdateEvtQuery(object):
         assert st_code == 200, resp
 
     def test_update_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
         # Expect that inserting a row (which would have triggered in original
         # create_event_trigger) does not trigger
@@ -413,36 +432,31 @@ class TestUpdateEvtQuery(object):
         with pytest.raises(queue.Empty):
             check_event(hge_ctx, evts_webhook, "t1_cols", table, "UPDATE", {}, webhook_path = "/new", get_timeout = 0)
 
+        row = {**init_row, **set_exp}
+
         where_exp = {"c1": 1}
         set_exp = {"c3": {"name": "bellamy"}}
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world", "c3": {"name": "clarke"}},
-            "new": {"c1": 1, "c2": "world", "c3": {"name": "bellamy"}}
-        }
+        exp_ev_data = ev_data(old=row, new={**row, **set_exp})
+        row = exp_ev_data["new"]
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "UPDATE", exp_ev_data, webhook_path ="/new")
 
         where_exp = {"c1": 1}
         set_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world", "c3": {"name": "bellamy"}},
-            "new": {"c1": 2, "c2": "world", "c3": {"name": "bellamy"}}
-        }
+        exp_ev_data = ev_data(old=row, new={**row, **set_exp})
+        row = exp_ev_data["new"]
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "UPDATE", exp_ev_data, webhook_path ="/new")
 
         where_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c1": 2, "c2": "world", "c3": {"name": "bellamy"}},
-            "new": None
-        }
+        exp_ev_data = ev_data(old=row)
         st_code, resp = delete(hge_ctx, table, where_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "DELETE", exp_ev_data, webhook_path = "/new")
 
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestDeleteEvtQuery(object):
 
     directory = 'queries/event_triggers'
@@ -456,33 +470,23 @@ class TestDeleteEvtQuery(object):
 
     # Ensure deleting an event trigger works
     def test_delete_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         with pytest.raises(queue.Empty):
             check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data, get_timeout=0)
 
         where_exp = {"c1": 1}
         set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
+        exp_ev_data = ev_data(old=INIT_ROW, new={**INIT_ROW, "c2": "world"})
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         with pytest.raises(queue.Empty):
             check_event(hge_ctx, evts_webhook, "t1_all", table, "UPDATE", exp_ev_data, get_timeout=0)
 
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
+        exp_ev_data = ev_data(old={"c1": 1, "c2": "world"})
         st_code, resp = delete(hge_ctx, table, where_exp)
         assert st_code == 200, resp
         with pytest.raises(queue.Empty):
@@ -497,14 +501,10 @@ class TestEvtSelCols:
         return 'queries/event_triggers/selected_cols'
 
     def test_selected_cols(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": {"c1": 1, "c2": "hello"}
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "INSERT", exp_ev_data)
 
@@ -518,19 +518,13 @@ class TestEvtSelCols:
 
         where_exp = {"c1": 1}
         set_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": {"c1": 2, "c2": "world"}
-        }
+        exp_ev_data = ev_data(old={"c1": 1, "c2": "world"}, new={"c1": 2, "c2": "world"})
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "UPDATE", exp_ev_data)
 
         where_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c1": 2, "c2": "world"},
-            "new": None
-        }
+        exp_ev_data = ev_data(old={"c1": 2, "c2": "world"})
         st_code, resp = delete(hge_ctx, table, where_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_cols", table, "DELETE", exp_ev_data)
@@ -554,7 +548,7 @@ class TestEvtSelCols:
         })
         assert st_code == 200, resp
 
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestEvtInsertOnly:
 
     @classmethod
@@ -562,32 +556,22 @@ class TestEvtInsertOnly:
         return 'queries/event_triggers/insert_only'
 
     def test_insert_only(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_insert", table, "INSERT", exp_ev_data)
 
         where_exp = {"c1": 1}
         set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
+        exp_ev_data = ev_data(old=INIT_ROW, new={**INIT_ROW, "c2": "world"})
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         with pytest.raises(queue.Empty):
             check_event(hge_ctx, evts_webhook, "t1_insert", table, "UPDATE", exp_ev_data, get_timeout=0)
 
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
+        exp_ev_data = ev_data(old={"c1": 1, "c2": "world"})
         st_code, resp = delete(hge_ctx, table, where_exp)
         assert st_code == 200, resp
         with pytest.raises(queue.Empty):
@@ -603,42 +587,29 @@ class TestEvtSelPayload:
         return 'queries/event_triggers/selected_payload'
 
     def test_selected_payload(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": {"c1": 1, "c2": "hello"}
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
+        exp_ev_data = ev_data(new=INIT_ROW)
+        st_code, resp = insert(hge_ctx, table, INIT_ROW)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_payload", table, "INSERT", exp_ev_data)
 
         where_exp = {"c1": 1}
         set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": {"c1": 1},
-            "new": {"c1": 1}
-        }
+        exp_ev_data = ev_data(old={"c1": 1}, new={"c1": 1})
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_payload", table, "UPDATE", exp_ev_data)
 
         where_exp = {"c1": 1}
         set_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c1": 1},
-            "new": {"c1": 2}
-        }
+        exp_ev_data = ev_data(old={"c1": 1}, new={"c1": 2})
         st_code, resp = update(hge_ctx, table, where_exp, set_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_payload", table, "UPDATE", exp_ev_data)
 
         where_exp = {"c1": 2}
-        exp_ev_data = {
-            "old": {"c2": "world"},
-            "new": None
-        }
+        exp_ev_data = ev_data(old={"c2": "world"})
         st_code, resp = delete(hge_ctx, table, where_exp)
         assert st_code == 200, resp
         check_event(hge_ctx, evts_webhook, "t1_payload", table, "DELETE", exp_ev_data)
@@ -662,81 +633,23 @@ class TestEvtSelPayload:
         assert st_code == 400, resp
         assert resp['code'] == "dependency-error", resp
 
-@usefixtures('per_method_tests_db_state')
-class TestWebhookEnv(object):
+@usefixtures('per_class_tests_db_state')
+class TestWebhookEnv(BasicCrudEvents):
 
     @classmethod
     def dir(cls):
         return 'queries/event_triggers/webhook_env'
 
-    def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
-
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data)
-
-        where_exp = {"c1": 1}
-        set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
-        st_code, resp = update(hge_ctx, table, where_exp, set_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "UPDATE", exp_ev_data)
-
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
-        st_code, resp = delete(hge_ctx, table, where_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "DELETE", exp_ev_data)
+@usefixtures('per_class_tests_db_state')
+class TestWebhookTemplateURL(BasicCrudEvents):
 
-@usefixtures('per_method_tests_db_state')
-class TestWebhookTemplateURL(object):
+    webhook_path = '/trigger'
 
     @classmethod
     def dir(cls):
         return 'queries/event_triggers/webhook_template_url'
 
-    def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
-
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        st_code, resp = insert(hge_ctx, table, init_row)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data, webhook_path = '/trigger')
-
-        where_exp = {"c1": 1}
-        set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
-        st_code, resp = update(hge_ctx, table, where_exp, set_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "UPDATE", exp_ev_data, webhook_path = '/trigger')
-
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
-        st_code, resp = delete(hge_ctx, table, where_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "DELETE", exp_ev_data, webhook_path = '/trigger')
-
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestSessionVariables(object):
 
     @classmethod
@@ -744,40 +657,25 @@ class TestSessionVariables(object):
         return 'queries/event_triggers/basic'
 
     def test_basic(self, hge_ctx, evts_webhook):
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
+
+        insert_session_variables = { 'x-hasura-role': 'admin', 'x-hasura-allowed-roles': "['admin','user']", 'x-hasura-user-id': '1'}
+        update_session_variables = { 'x-hasura-role': 'admin', 'x-hasura-random': 'some_random_info'}
+        steps = [
+            BASIC_CRUD_STEPS[0]._replace(
+                headers = insert_session_variables,
+                check_kwargs = {"session_variables": insert_session_variables}
+            ),
+            BASIC_CRUD_STEPS[1]._replace(
+                headers = {**update_session_variables, 'X-Random-Header': 'not_session_variable'},
+                check_kwargs = {"session_variables": update_session_variables}
+            ),
+            BASIC_CRUD_STEPS[2]
+        ]
+        run_crud_events(hge_ctx, evts_webhook, table, "t1_all", steps)
 
-        init_row = {"c1": 1, "c2": "hello"}
-        exp_ev_data = {
-            "old": None,
-            "new": init_row
-        }
-        session_variables = { 'x-hasura-role': 'admin', 'x-hasura-allowed-roles': "['admin','user']", 'x-hasura-user-id': '1'}
-        st_code, resp = insert(hge_ctx, table, init_row, headers = session_variables)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "INSERT", exp_ev_data, session_variables = session_variables)
 
-        where_exp = {"c1": 1}
-        set_exp = {"c2": "world"}
-        exp_ev_data = {
-            "old": init_row,
-            "new": {"c1": 1, "c2": "world"}
-        }
-        session_variables = { 'x-hasura-role': 'admin', 'x-hasura-random': 'some_random_info', 'X-Random-Header': 'not_session_variable'}
-        st_code, resp = update(hge_ctx, table, where_exp, set_exp, headers = session_variables)
-        assert st_code == 200, resp
-        session_variables.pop('X-Random-Header')
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "UPDATE", exp_ev_data, session_variables = session_variables)
-
-        exp_ev_data = {
-            "old": {"c1": 1, "c2": "world"},
-            "new": None
-        }
-        st_code, resp = delete(hge_ctx, table, where_exp)
-        assert st_code == 200, resp
-        check_event(hge_ctx, evts_webhook, "t1_all", table, "DELETE", exp_ev_data)
-
-
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestManualEvents(object):
 
     @classmethod
@@ -785,10 +683,14 @@ class TestManualEvents(object):
         return 'queries/event_triggers/manual_events'
 
     def test_basic(self, hge_ctx, evts_webhook):
-        st_code, resp = hge_ctx.v1metadataq_f('queries/event_triggers/manual_events/enabled.yaml')
-        assert st_code == 200, resp
-        st_code, resp = hge_ctx.v1metadataq_f('queries/event_triggers/manual_events/disabled.yaml')
-        assert st_code == 400, resp
+        # The two invocations don't share any state, so overlap them:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            enabled = executor.submit(hge_ctx.v1metadataq_f, 'queries/event_triggers/manual_events/enabled.yaml')
+            disabled = executor.submit(hge_ctx.v1metadataq_f, 'queries/event_triggers/manual_events/disabled.yaml')
+            st_code, resp = enabled.result()
+            assert st_code == 200, resp
+            st_code, resp = disabled.result()
+            assert st_code == 400, resp
 
     # This test is being added to ensure that the manual events
     # are not failing after any reload_metadata operation, this
@@ -801,6 +703,8 @@ class TestManualEvents(object):
             }
         }
 
+        # NOTE: the iterations themselves must stay sequential, since each
+        # checks manual events against the metadata the last one reloaded
         for _ in range(5):
             self.test_basic(hge_ctx, evts_webhook)
 
@@ -809,9 +713,15 @@ class TestManualEvents(object):
 
             self.test_basic(hge_ctx, evts_webhook)           
 
-@usefixtures('per_method_tests_db_state')
+@usefixtures('per_class_tests_db_state')
 class TestEventsAsynchronousExecution(object):
 
+    # How many events to generate, and how many of them the graphql-engine is
+    # expected to process at once. Override these to match the engine's
+    # configuration, to exercise more parallelism.
+    n_events = int(os.environ.get('HGE_PARALLEL_EVENT_TEST_N', 30))
+    workers = int(os.environ.get('HGE_EVENTS_WORKERS', 5))
+
     @classmethod
     def dir(cls):
         return 'queries/event_triggers/async_execution'
@@ -823,22 +733,32 @@ class TestEventsAsynchronousExecution(object):
         all the events and that time should definitely be lesser than the time
         taken if the events were to be executed sequentially.
 
-        This test inserts 5 rows and the webhook(/sleep_2s) takes
-        ~2 seconds to process one request. So, if the graphql-engine
-        were to process the events sequentially it will take 5 * 2 = 10 seconds.
-        Theorotically, all the events should have been processed in ~2 seconds,
-        adding a 5 seconds buffer to the comparision, so that this test
-        doesn't flake in the CI.
+        This test inserts n_events rows and the webhook(/sleep_500ms) takes
+        ~0.5 seconds to process one request. So, if the graphql-engine
+        were to process the events sequentially it will take n_events * 0.5
+        seconds. Theorotically, with at least 'workers' events processed at a
+        time, all the events should have been processed in
+        ceil(n_events / workers) * 0.5 seconds, plus up to 1 second for the
+        engine to fetch them (its default event fetch interval). Adding a 5
+        seconds buffer to the comparision, so that this test doesn't flake in
+        the CI, gives the bound:
+
+            ceil(n_events / workers) * 0.5s + 1s fetch interval + 5s buffer
+
+        e.g. with the defaults of 30 events and 5 workers, 3 + 1 + 5 = 9
+        seconds, well under the 15 seconds sequential processing would take.
         """
-        table = {"schema": "hge_tests", "name": "test_t1"}
+        table = TEST_T1
 
-        payload = range(1,6)
-        rows = list(map(lambda x: {"c1": x, "c2": "hello"}, payload))
+        rows = [{"c1": x, "c2": "hello"} for x in range(1, self.n_events + 1)]
+        bound_secs = math.ceil(self.n_events / self.workers) * 0.5 + 1 + 5
         st_code, resp = insert_many(hge_ctx, table, rows)
-        start_time = time.perf_counter()
         assert st_code == 200, resp
-        for i in range(1,6):
-            _ = evts_webhook.get_event(5) # webhook takes 2 seconds to process a request (+ buffer)
-        end_time = time.perf_counter()
-        time_elapsed = end_time - start_time
-        assert time_elapsed < 10
+        start_ns = time.monotonic_ns()
+        # Wait for all the deliveries against a single deadline, so that if
+        # events aren't being processed in parallel we fail (with queue.Empty)
+        # as soon as that's clear, rather than after compounding per-event
+        # timeouts. Skip any redeliveries, which could hide a missing event:
+        _ = evts_webhook.get_events(self.n_events, timeout=bound_secs, unique=True)
+        time_elapsed_ns = time.monotonic_ns() - start_ns
+        assert time_elapsed_ns < bound_secs * 10**9
@@ -4,6 +4,11 @@
 # tests are running correctly, or test our python test helpers.
 
 import pytest
+import queue
+import threading
+import time
+import utils
+from context import EvtsWebhookServer
 from validate import (
     check_query_f,
     collapse_order_not_selset,
@@ -253,3 +258,84 @@ class TestTests3:
     @classmethod
     def dir(cls):
         return "queries/graphql_mutation/insert/constraints"
+
+
+class TestEvtsWebhookServer:
+    """
+    Test the event queue of EvtsWebhookServer, which the event trigger tests
+    rely on. These don't need a graphql-engine: we put events ourselves.
+    """
+
+    @pytest.fixture
+    def server(self):
+        server = EvtsWebhookServer(('127.0.0.1', 0))
+        yield server
+        server.server_close()
+
+    def test_get_events_from_concurrent_puts(self, server):
+        def put_events(ids):
+            for i in ids:
+                server.put_event({"body": {"id": i}})
+        threads = [threading.Thread(target=put_events, args=(range(x, 100, 4),)) for x in range(4)]
+        for t in threads:
+            t.start()
+        events = server.get_events(100, 5)
+        for t in threads:
+            t.join()
+        assert sorted(ev["body"]["id"] for ev in events) == list(range(100))
+        assert server.is_queue_empty()
+
+    def test_get_events_empty(self, server):
+        with pytest.raises(queue.Empty):
+            server.get_events(1, 0)
+
+    def test_get_event(self, server):
+        server.put_event({"body": {"id": 1}})
+        server.put_event({"body": {"id": 2}})
+        assert server.get_event(1) == {"body": {"id": 1}}
+        assert not server.is_queue_empty()
+
+    def test_get_events_unique(self, server):
+        for i in [1, 1, 2, 3]:
+            server.put_event({"body": {"id": i}})
+        events = server.get_events(3, 1, unique=True)
+        assert [ev["body"]["id"] for ev in events] == [1, 2, 3]
+        assert server.is_queue_empty()
+
+    def test_get_events_unique_evicted(self, server):
+        server.max_returned_ids = 2
+        for i in [1, 2, 3]:
+            server.put_event({"body": {"id": i}})
+        server.get_events(3, 1, unique=True)
+        # 1 has been evicted from the returned ids, but 3 hasn't:
+        server.put_event({"body": {"id": 3}})
+        server.put_event({"body": {"id": 1}})
+        events = server.get_events(1, 1, unique=True)
+        assert [ev["body"]["id"] for ev in events] == [1]
+
+
+class TestAssertStable:
+    """
+    Test utils.assert_stable, which doesn't need a graphql-engine.
+    """
+
+    def test_raises_on_first_failure(self):
+        calls = []
+        def func():
+            calls.append(None)
+            assert len(calls) < 2
+        with pytest.raises(AssertionError):
+            utils.assert_stable(1, 0, func)
+        assert len(calls) == 2
+
+    def test_min_passes(self):
+        calls = []
+        utils.assert_stable(0, 0, lambda: calls.append(None), passes=3)
+        assert len(calls) == 3
+
+    def test_full_duration(self):
+        calls = []
+        start = time.monotonic()
+        utils.assert_stable(0.5, 0.1, lambda: calls.append(None), passes=1)
+        assert time.monotonic() - start >= 0.5
+        assert len(calls) > 1
@@ -2,9 +2,10 @@
 
 import time
 
-# Loop a function 'tries' times, until all assertions pass. With a 0.3 second
-# pause after each. This re-raises AssertionError in case we run out of tries
-def until_asserts_pass(tries, func):
+# Loop a function 'tries' times, until all assertions pass. With an 'interval'
+# second pause after each. This re-raises AssertionError in case we run out of
+# tries
+def until_asserts_pass(tries, func, interval=0.3):
     for x in range(0, tries):
         print(x)
         if x == tries-1:
@@ -15,5 +16,18 @@ def until_asserts_pass(tries, func):
                 func()
                 break
             except AssertionError:
-                time.sleep(0.3)
+                time.sleep(interval)
                 pass
+
+# Call 'func' every 'interval' seconds for 'duration' seconds, checking that its
+# assertions keep holding over that whole window. 'func' is called at least
+# 'passes' times, even for a short window. Any AssertionError is raised
+# immediately.
+def assert_stable(duration, interval, func, passes=3):
+    deadline = time.monotonic() + duration
+    x = 0
+    while x < passes or time.monotonic() < deadline:
+        if x > 0:
+            time.sleep(interval)
+        func()
+        x += 1
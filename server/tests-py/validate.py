@@ -60,6 +60,25 @@ def check_event(hge_ctx, evts_webhook, trig_name, table, operation, exp_ev_data,
                 get_timeout = 3
 ):
     ev_full = evts_webhook.get_event(get_timeout)
+    validate_event(ev_full, trig_name, table, operation, exp_ev_data,
+                   headers, webhook_path, session_variables, retry)
+
+# Like check_event, but for the successive deliveries of a single event which
+# is retried. Waits up to 'get_timeout' seconds per expected delivery.
+def check_events_seq(hge_ctx, evts_webhook, trig_name, table, operation, exp_ev_data,
+                     headers = {},
+                     webhook_path = '/',
+                     session_variables = {'x-hasura-role': 'admin'},
+                     retries = range(5),
+                     get_timeout = 3
+):
+    evs_full = evts_webhook.get_events(len(retries), get_timeout * len(retries))
+    for ev_full, retry in zip(evs_full, retries):
+        validate_event(ev_full, trig_name, table, operation, exp_ev_data,
+                       headers, webhook_path, session_variables, retry)
+
+def validate_event(ev_full, trig_name, table, operation, exp_ev_data,
+                   headers, webhook_path, session_variables, retry):
     validate_event_webhook(ev_full['path'], webhook_path)
     validate_event_headers(ev_full['headers'], headers)
     validate_event_payload(ev_full['body'], trig_name, table)